@@ -1,41 +1,284 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import socketio
+import asyncio
 import os
+import time
+import hashlib
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import ConnectionFailure, OperationFailure
 from collections import defaultdict
+from functools import lru_cache
+import orjson
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection. One client per process, shared by every handler; Motor
+# binds it to the running loop on first use. zstd wire compression (zlib as
+# fallback for servers without it) shrinks order, KOT and report payloads;
+# the zlib level is kept low so the fallback stays cheap on CPU.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=10,
+    maxIdleTimeMS=60000,
+    serverSelectionTimeoutMS=3000,
+    compressors=os.environ.get('MONGO_COMPRESSORS', 'zstd,zlib'),
+    zlibCompressionLevel=int(os.environ.get('MONGO_ZLIB_LEVEL', '3'))
+)
 db = client[os.environ['DB_NAME']]
 
+# Upper bound on documents per cursor batch. Pages (menu, KOTs, expenses: <=1000)
+# and report reads (<=10000) fit in one batch, avoiding the getMore that follows
+# Mongo's default 101-document first batch.
+MONGO_BATCH_SIZE = int(os.environ.get('MONGO_BATCH_SIZE', '10000'))
+
+def orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+# Encodes raw Mongo documents directly (ObjectId as its hex string), so
+# responses skip FastAPI's jsonable_encoder pass
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(
+        content,
+        default=orjson_default,
+        option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+    )
+
+class MongoJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+# Socket.IO packet codec on the same encoder: each emit is encoded once in C,
+# and broadcast documents go out as-is without copying or converting ids
+class SocketJSON:
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        return dump_json(obj).decode()
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
 # Socket.IO for real-time updates
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',
     logger=True,
-    engineio_logger=True
+    engineio_logger=True,
+    json=SocketJSON
 )
 
-app = FastAPI()
+# In-process cache of encoded bodies for rarely-changing reads (menu, settings).
+# Writes in this process invalidate immediately; the TTL bounds staleness
+# across workers. Each invalidation bumps the key's generation, and a fill
+# passes the generation it read under, so a read that was in flight during
+# a write can't store the old body afterwards.
+CACHE_TTL = 300
+response_cache: Dict[str, tuple] = {}
+cache_generations: Dict[str, int] = {}
+
+def cache_get(key: str) -> Optional[bytes]:
+    entry = response_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+def cache_generation(key: str) -> int:
+    return cache_generations.get(key, 0)
+
+def cache_set(key: str, body: bytes, ttl: float = CACHE_TTL, generation: Optional[int] = None):
+    if generation is not None and generation != cache_generation(key):
+        return
+    response_cache[key] = (time.monotonic() + ttl, body)
+
+def cache_invalidate(key: str):
+    response_cache.pop(key, None)
+    cache_generations[key] = cache_generation(key) + 1
+
+# The settings document backs both /settings and /printers
+def invalidate_settings():
+    cache_invalidate('settings')
+    cache_invalidate('printers')
+
+def raw_json(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+# Optional ?fields= projection for list endpoints, e.g. ?fields=status,total,tableNumber.
+# Full documents stay the default: clients PUT list entries back whole.
+def parse_fields(fields: Optional[str]) -> Optional[Dict[str, int]]:
+    return {f: 1 for f in fields.split(',') if f} if fields else None
+
+async def fetch_docs(cursor, length: int) -> List[Dict[str, Any]]:
+    return await cursor.batch_size(min(length, MONGO_BATCH_SIZE)).to_list(length)
+
+async def dump_cursor(cursor, length: int) -> bytes:
+    return dump_json(await fetch_docs(cursor, length))
+
+# Encodes a cursor as a JSON array while it is still being read, flushing
+# every STREAM_CHUNK documents so memory stays flat for large results
+STREAM_CHUNK = 100
+STREAM_BATCH_SIZE = 500
+
+async def stream_cursor(cursor, first: Optional[Dict[str, Any]] = None):
+    sep = b'['
+    chunk = []
+    if first is not None:
+        chunk.append(sep + dump_json(first))
+        sep = b','
+    async for doc in cursor:
+        chunk.append(sep + dump_json(doc))
+        sep = b','
+        if len(chunk) >= STREAM_CHUNK:
+            yield b''.join(chunk)
+            chunk = []
+    chunk.append(b'[]' if sep == b'[' else b']')
+    yield b''.join(chunk)
+
+# The first batch is fetched before the response starts, so query errors (a bad
+# projection, a server error) still become a 500 instead of a truncated 200.
+# length must be positive: Mongo treats limit(0) as no limit.
+async def stream_json(cursor, length: int) -> Response:
+    cursor = cursor.limit(length).batch_size(min(length, STREAM_BATCH_SIZE))
+    first = await anext(cursor, None)
+    if first is None:
+        return raw_json(b'[]')
+    return StreamingResponse(stream_cursor(cursor, first), media_type="application/json")
+
+# Coalesces bursts of $set updates to one collection into a single bulk_write.
+# Callers await their own update; a batch is flushed once max_batch updates are
+# queued or max_wait seconds after its first one, whichever comes first.
+class UpdateBatcher:
+    def __init__(self, collection, max_batch: int = 50, max_wait: float = 0.05, timeout: float = 10.0):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.full = asyncio.Event()
+        self.in_flight: List[tuple] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        # Nothing will flush these now; fail their callers instead of leaving them waiting
+        pending = self.in_flight
+        self.in_flight = []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for _, _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Update batcher stopped"))
+
+    async def update(self, doc_id: ObjectId, fields: Dict[str, Any]):
+        # Started on first use, and restarted if the worker has died
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((doc_id, fields, future))
+        # The worker holds the first update of a batch outside the queue
+        if self.queue.qsize() + 1 >= self.max_batch:
+            self.full.set()
+        await asyncio.wait_for(future, self.timeout)
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Tracked from the moment it leaves the queue, so stop() can fail it
+            self.in_flight = batch
+            self.full.clear()
+            if self.queue.qsize() + 1 < self.max_batch:
+                try:
+                    await asyncio.wait_for(self.full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self.flush(batch)
+            self.in_flight = []
+
+    async def flush(self, batch):
+        # Callers that timed out were already answered with an error; don't apply their updates
+        batch = [entry for entry in batch if not entry[2].done()]
+        if not batch:
+            return
+        # Ordered, so repeated updates to the same document apply in arrival order
+        ops = [UpdateOne({"_id": doc_id}, {"$set": fields}) for doc_id, fields, _ in batch]
+        try:
+            await self.collection.bulk_write(ops)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+order_updates = UpdateBatcher(db.orders)
+kot_updates = UpdateBatcher(db.kot_batches)
+
+app = FastAPI(default_response_class=MongoJSONResponse)
 api_router = APIRouter(prefix="/api")
 
-# Helper function to convert ObjectId to string
-def serialize_doc(doc):
-    if doc and '_id' in doc:
-        doc['_id'] = str(doc['_id'])
-    return doc
+# Unhandled errors surface as 500 with the message as detail; HTTPExceptions
+# raised by handlers keep their own status. This is a middleware rather than an
+# Exception handler: Starlette runs those in ServerErrorMiddleware, outside CORS
+# and gzip. Registered before CORSMiddleware, so it runs inside it. Plain ASGI
+# rather than @app.middleware("http"), which would put a task group and a
+# memory stream in front of every request and streamed body.
+class UnhandledErrorsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = False
+
+        async def track_start(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, track_start)
+        except Exception as exc:
+            logging.getLogger(__name__).exception("Unhandled error on %s %s", scope["method"], scope["path"])
+            # Too late for a 500 once the status line is out; let the server drop the connection
+            if started:
+                raise
+            response = MongoJSONResponse({"detail": str(exc)}, status_code=500)
+            await response(scope, receive, send)
+
+app.add_middleware(UnhandledErrorsMiddleware)
 
 # ==================== Models ====================
 
@@ -151,6 +394,57 @@ class Printer(BaseModel):
     isDefault: bool = False
     lastConnected: Optional[datetime] = None
 
+# Seed documents, built once at import; callers add the timestamp
+DEFAULT_TABLE_COUNT = 20
+DEFAULT_TABLE = {"capacity": 4, "status": "available", "currentOrder": None}
+DEFAULT_SETTINGS = {
+    "restaurantName": "RestoPOS",
+    "currency": "₹",
+    "taxRate": 0.05,
+    "printers": []
+}
+
+# Decode and validate a request body in one pass with model_validate_json,
+# instead of FastAPI's json.loads followed by a separate validation walk
+def parse_body(model):
+    async def parse(request: Request):
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError([
+                {**err, 'loc': ('body', *err['loc'])}
+                for err in e.errors(include_url=False)
+            ])
+    return Depends(parse)
+
+# parse_body hides the model from FastAPI, so routes using it declare the body
+# for OpenAPI themselves via openapi_extra=json_body(Model). The model schemas
+# (and their nested $defs) are added to the document's components.
+BODY_SCHEMAS: Dict[str, Any] = {}
+
+def json_body(model) -> Dict[str, Any]:
+    schema = model.model_json_schema(ref_template='#/components/schemas/{model}')
+    BODY_SCHEMAS.update(schema.pop('$defs', {}))
+    BODY_SCHEMAS[model.__name__] = schema
+    return {"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"$ref": f"#/components/schemas/{model.__name__}"}}}
+    }}
+
+# Hot ids (menu items in orders, open orders and KOTs) are parsed repeatedly
+@lru_cache(maxsize=4096)
+def to_object_id(value: str) -> ObjectId:
+    return ObjectId(value)
+
+# Path parameter parsed to an ObjectId before the handler runs; malformed ids get a 400
+def object_id_path(name: str):
+    def parse(request: Request) -> ObjectId:
+        try:
+            return to_object_id(request.path_params[name])
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return Depends(parse)
+
 # ==================== Socket.IO Events ====================
 
 @sio.event
@@ -173,610 +467,634 @@ async def subscribe_kitchen(sid):
     print(f"Client {sid} subscribed to kitchen")
 
 async def broadcast_order_update(order):
-    await sio.emit('order_updated', serialize_doc(order), room='orders')
+    await sio.emit('order_updated', order, room='orders')
 
 async def broadcast_kot_update(kot):
-    await sio.emit('kot_updated', serialize_doc(kot), room='kitchen')
+    await sio.emit('kot_updated', kot, room='kitchen')
 
 async def broadcast_table_update(table):
-    await sio.emit('table_updated', serialize_doc(table), room='orders')
+    await sio.emit('table_updated', table, room='orders')
 
 # ==================== Menu Endpoints ====================
 
-@api_router.get("/menu")
-async def get_menu():
-    try:
-        items = await db.menu_items.find().to_list(1000)
-        return [serialize_doc(item) for item in items]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# Category and recipe per menu item id, shared by order creation and the sales
+# report. Dropped with the menu cache on menu writes, sharing its generation;
+# the TTL bounds staleness across workers. A forced refresh (an order naming
+# an unknown id) reloads at most once per MENU_REFRESH_INTERVAL, so deleted or
+# junk ids from stale clients can't turn every order into a full menu scan.
+MENU_REFRESH_INTERVAL = 5
+menu_lookup_cache: Dict[str, Any] = {"map": {}, "expires": 0.0, "loaded": float('-inf')}
+
+async def menu_lookup(refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+    now = time.monotonic()
+    if refresh and now - menu_lookup_cache["loaded"] < MENU_REFRESH_INTERVAL:
+        refresh = False
+    if refresh or menu_lookup_cache["expires"] <= now:
+        generation = cache_generation('menu')
+        items = await fetch_docs(db.menu_items.find({}, {"category": 1, "ingredients": 1}), 1000)
+        lookup = {str(m['_id']): m for m in items}
+        if generation == cache_generation('menu'):
+            menu_lookup_cache["map"] = lookup
+            menu_lookup_cache["loaded"] = now
+            menu_lookup_cache["expires"] = now + CACHE_TTL
+        return lookup
+    return menu_lookup_cache["map"]
+
+def invalidate_menu():
+    cache_invalidate('menu')
+    menu_lookup_cache["expires"] = 0.0
 
-@api_router.post("/menu")
-async def create_menu_item(item: MenuItem):
-    try:
-        item_dict = item.dict(exclude={'id'})
-        result = await db.menu_items.insert_one(item_dict)
-        item_dict['_id'] = str(result.inserted_id)
-        return serialize_doc(item_dict)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/menu/{item_id}")
-async def update_menu_item(item_id: str, item: MenuItem):
-    try:
-        item_dict = item.dict(exclude={'id'})
-        await db.menu_items.update_one(
-            {"_id": ObjectId(item_id)},
-            {"$set": item_dict}
-        )
-        item_dict['_id'] = item_id
-        return serialize_doc(item_dict)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@api_router.get("/menu")
+async def get_menu(fields: Optional[str] = None):
+    # Projected reads bypass the cache, which only holds full documents
+    if fields:
+        return raw_json(await dump_cursor(db.menu_items.find({}, parse_fields(fields)), 1000))
+    body = cache_get('menu')
+    if body is None:
+        generation = cache_generation('menu')
+        body = await dump_cursor(db.menu_items.find(), 1000)
+        cache_set('menu', body, generation=generation)
+    return raw_json(body)
+
+@api_router.post("/menu", openapi_extra=json_body(MenuItem))
+async def create_menu_item(item: MenuItem = parse_body(MenuItem)):
+    item_dict = item.model_dump(exclude={'id'})
+    result = await db.menu_items.insert_one(item_dict)
+    invalidate_menu()
+    item_dict['_id'] = str(result.inserted_id)
+    return MongoJSONResponse(item_dict)
+
+@api_router.put("/menu/{item_id}", openapi_extra=json_body(MenuItem))
+async def update_menu_item(item_id: str, item: MenuItem = parse_body(MenuItem), oid: ObjectId = object_id_path('item_id')):
+    item_dict = item.model_dump(exclude={'id'})
+    updated = await db.menu_items.find_one_and_update(
+        {"_id": oid},
+        {"$set": item_dict},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Menu item not found")
+    invalidate_menu()
+    return MongoJSONResponse(updated)
 
 @api_router.delete("/menu/{item_id}")
-async def delete_menu_item(item_id: str):
-    try:
-        await db.menu_items.delete_one({"_id": ObjectId(item_id)})
-        return {"success": True}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def delete_menu_item(item_id: str, oid: ObjectId = object_id_path('item_id')):
+    await db.menu_items.delete_one({"_id": oid})
+    invalidate_menu()
+    return {"success": True}
 
 # ==================== Tables Endpoints ====================
 
 @api_router.get("/tables")
 async def get_tables():
-    try:
-        tables = await db.tables.find().to_list(100)
-        if not tables:
-            default_tables = [
-                {"tableNumber": i, "capacity": 4, "status": "available", "currentOrder": None, "updatedAt": datetime.utcnow()}
-                for i in range(1, 21)
-            ]
-            await db.tables.insert_many(default_tables)
-            tables = await db.tables.find().to_list(100)
-        return [serialize_doc(table) for table in tables]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/tables/{table_id}")
-async def update_table(table_id: str, table: Table):
-    try:
-        table_dict = table.dict(exclude={'id'})
-        table_dict['updatedAt'] = datetime.utcnow()
-        await db.tables.update_one(
-            {"_id": ObjectId(table_id)},
-            {"$set": table_dict}
-        )
-        table_dict['_id'] = table_id
-        updated_table = serialize_doc(table_dict)
-        await broadcast_table_update(updated_table)
-        return updated_table
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Walks the unique tableNumber index, so tables come back in floor order
+    return raw_json(await dump_cursor(db.tables.find().sort("tableNumber", 1), 100))
+
+@api_router.put("/tables/{table_id}", openapi_extra=json_body(Table))
+async def update_table(table_id: str, table: Table = parse_body(Table), oid: ObjectId = object_id_path('table_id')):
+    table_dict = table.model_dump(exclude={'id'})
+    table_dict['updatedAt'] = datetime.utcnow()
+    updated = await db.tables.find_one_and_update(
+        {"_id": oid},
+        {"$set": table_dict},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Table not found")
+    await broadcast_table_update(updated)
+    return MongoJSONResponse(updated)
 
 # ==================== Orders Endpoints ====================
 
 @api_router.get("/orders")
-async def get_orders(status: Optional[str] = None, limit: int = 100):
-    try:
-        query = {}
-        if status:
-            query['status'] = status
-        orders = await db.orders.find(query).sort("createdAt", -1).to_list(limit)
-        return [serialize_doc(order) for order in orders]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_orders(status: Optional[str] = None, limit: int = Query(100, ge=1), fields: Optional[str] = None):
+    query = {}
+    if status:
+        query['status'] = status
+    return await stream_json(db.orders.find(query, parse_fields(fields)).sort("createdAt", -1), limit)
 
 @api_router.get("/orders/{order_id}")
-async def get_order(order_id: str):
-    try:
-        order = await db.orders.find_one({"_id": ObjectId(order_id)})
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
-        return serialize_doc(order)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.post("/orders")
-async def create_order(order: Order):
-    try:
-        order_dict = order.dict(exclude={'id'})
-        
-        # Generate token number for takeout
-        if order.orderType == "takeout" and not order.tokenNumber:
-            last_order = await db.orders.find_one(
-                {"orderType": "takeout"},
-                sort=[("tokenNumber", -1)]
-            )
-            order_dict['tokenNumber'] = (last_order.get('tokenNumber', 0) + 1) if last_order else 1
-        
-        result = await db.orders.insert_one(order_dict)
-        order_dict['_id'] = str(result.inserted_id)
-        
-        # Update table status if dine-in
-        if order.orderType == "dine-in" and order.tableNumber:
-            await db.tables.update_one(
-                {"tableNumber": order.tableNumber},
-                {"$set": {"status": "occupied", "currentOrder": str(result.inserted_id)}}
-            )
+async def get_order(order_id: str, oid: ObjectId = object_id_path('order_id')):
+    order = await db.orders.find_one({"_id": oid})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return MongoJSONResponse(order)
+
+@api_router.post("/orders", openapi_extra=json_body(Order))
+async def create_order(order: Order = parse_body(Order)):
+    order_dict = order.model_dump(exclude={'id'})
+    
+    # Generate token number for takeout
+    if order.orderType == "takeout" and not order.tokenNumber:
+        order_dict['tokenNumber'] = await next_takeout_token()
+    
+    # Allocate the id client-side so the follow-up writes can be built up front
+    order_id = ObjectId()
+    order_dict['_id'] = order_id
+    order_ref = str(order_id)
+    created_at = order_dict['createdAt']
+    
+    # Deduct inventory for ingredients, stamped with the order's own timestamp.
+    # Recipes come from the cached menu lookup and deductions are summed per
+    # ingredient, so the round-trips don't grow with the size of the order.
+    deductions = defaultdict(int)
+    transactions = []
+    if order.items:
+        lookup = await menu_lookup()
+        # An id the lookup doesn't know (e.g. added on another worker) forces a
+        # reload, unless the map was loaded within the last few seconds
+        if any(item.menuItemId not in lookup for item in order.items):
+            lookup = await menu_lookup(refresh=True)
+        recipes = {
+            item.menuItemId: lookup[item.menuItemId].get('ingredients') or []
+            for item in order.items if item.menuItemId in lookup
+        }
         
-        # Deduct inventory for ingredients
         for item in order.items:
-            menu_item = await db.menu_items.find_one({"_id": ObjectId(item.menuItemId)})
-            if menu_item and menu_item.get('ingredients'):
-                for ingredient in menu_item['ingredients']:
-                    # Deduct stock
-                    await db.inventory.update_one(
-                        {"_id": ObjectId(ingredient['ingredientId'])},
-                        {"$inc": {"stock": -ingredient['quantity'] * item.quantity}}
-                    )
-                    # Log transaction
-                    await db.inventory_transactions.insert_one({
-                        "inventoryId": ingredient['ingredientId'],
-                        "type": "deduct",
-                        "quantity": ingredient['quantity'] * item.quantity,
-                        "reason": f"Order {str(result.inserted_id)}",
-                        "orderId": str(result.inserted_id),
-                        "createdAt": datetime.utcnow()
-                    })
-        
-        created_order = serialize_doc(order_dict)
-        await broadcast_order_update(created_order)
-        return created_order
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/orders/{order_id}")
-async def update_order(order_id: str, order: Order):
-    try:
-        order_dict = order.dict(exclude={'id'})
-        order_dict['updatedAt'] = datetime.utcnow()
-        await db.orders.update_one(
-            {"_id": ObjectId(order_id)},
-            {"$set": order_dict}
-        )
-        order_dict['_id'] = order_id
-        updated_order = serialize_doc(order_dict)
-        await broadcast_order_update(updated_order)
-        return updated_order
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            for ingredient in recipes.get(item.menuItemId, []):
+                quantity = ingredient['quantity'] * item.quantity
+                deductions[ingredient['ingredientId']] += quantity
+                transactions.append({
+                    "inventoryId": ingredient['ingredientId'],
+                    "type": "deduct",
+                    "quantity": quantity,
+                    "reason": f"Order {order_ref}",
+                    "orderId": order_ref,
+                    "createdAt": created_at
+                })
+    
+    # The order must exist before anything refers to it; the follow-up writes
+    # are independent of each other, so they overlap on the pool
+    await db.orders.insert_one(order_dict)
+    writes = []
+    if order.orderType == "takeout" and order.tokenNumber:
+        # Keep the counter ahead of client-assigned tokens
+        writes.append(db.counters.update_one(
+            {"_id": TAKEOUT_TOKEN_COUNTER},
+            {"$max": {"seq": order.tokenNumber}},
+            upsert=True
+        ))
+    if order.orderType == "dine-in" and order.tableNumber:
+        writes.append(db.tables.update_one(
+            {"tableNumber": order.tableNumber},
+            {"$set": {"status": "occupied", "currentOrder": order_ref}}
+        ))
+    if deductions:
+        writes.append(db.inventory.bulk_write([
+            UpdateOne({"_id": to_object_id(iid)}, stock_change(-qty))
+            for iid, qty in deductions.items()
+        ], ordered=False))
+        writes.append(db.inventory_transactions.insert_many(transactions))
+    await asyncio.gather(*writes)
+    
+    await broadcast_order_update(order_dict)
+    return MongoJSONResponse(order_dict)
+
+@api_router.put("/orders/{order_id}", openapi_extra=json_body(Order))
+async def update_order(order_id: str, order: Order = parse_body(Order), oid: ObjectId = object_id_path('order_id')):
+    order_dict = order.model_dump(exclude={'id'})
+    order_dict['updatedAt'] = datetime.utcnow()
+    await order_updates.update(oid, order_dict)
+    order_dict['_id'] = order_id
+    await broadcast_order_update(order_dict)
+    return MongoJSONResponse(order_dict)
 
 @api_router.delete("/orders/{order_id}")
-async def delete_order(order_id: str):
-    try:
-        order = await db.orders.find_one({"_id": ObjectId(order_id)})
-        if order and order.get('orderType') == 'dine-in':
-            await db.tables.update_one(
-                {"tableNumber": order.get('tableNumber')},
-                {"$set": {"status": "available", "currentOrder": None}}
-            )
-        
-        await db.orders.delete_one({"_id": ObjectId(order_id)})
-        await sio.emit('order_deleted', {'orderId': order_id}, room='orders')
-        return {"success": True}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def delete_order(order_id: str, oid: ObjectId = object_id_path('order_id')):
+    order = await db.orders.find_one_and_delete(
+        {"_id": oid},
+        projection={"orderType": 1, "tableNumber": 1}
+    )
+    followups = [sio.emit('order_deleted', {'orderId': order_id}, room='orders')]
+    if order and order.get('orderType') == 'dine-in' and order.get('tableNumber'):
+        followups.append(db.tables.update_one(
+            {"tableNumber": order['tableNumber']},
+            {"$set": {"status": "available", "currentOrder": None}}
+        ))
+    await asyncio.gather(*followups)
+    return {"success": True}
 
 # ==================== KOT Endpoints ====================
 
 @api_router.get("/kot")
-async def get_kot_batches(status: Optional[str] = None):
-    try:
-        query = {}
-        if status:
-            query['status'] = status
-        kots = await db.kot_batches.find(query).sort("createdAt", -1).to_list(1000)
-        return [serialize_doc(kot) for kot in kots]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.post("/kot")
-async def create_kot(kot: KOTBatch):
-    try:
-        kot_dict = kot.dict(exclude={'id'})
-        result = await db.kot_batches.insert_one(kot_dict)
-        kot_dict['_id'] = str(result.inserted_id)
-        
-        # Update order
-        await db.orders.update_one(
-            {"_id": ObjectId(kot.orderId)},
+async def get_kot_batches(status: Optional[str] = None, fields: Optional[str] = None):
+    query = {}
+    if status:
+        query['status'] = status
+    return await stream_json(db.kot_batches.find(query, parse_fields(fields)).sort("createdAt", -1), 1000)
+
+@api_router.post("/kot", openapi_extra=json_body(KOTBatch))
+async def create_kot(kot: KOTBatch = parse_body(KOTBatch)):
+    kot_dict = kot.model_dump(exclude={'id'})
+    kot_dict['_id'] = ObjectId()
+    
+    # Insert KOT and update order concurrently
+    await asyncio.gather(
+        db.kot_batches.insert_one(kot_dict),
+        db.orders.update_one(
+            {"_id": to_object_id(kot.orderId)},
             {"$set": {"kotSent": True, "status": "preparing"}}
         )
-        
-        created_kot = serialize_doc(kot_dict)
-        await broadcast_kot_update(created_kot)
-        return created_kot
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/kot/{kot_id}")
-async def update_kot(kot_id: str, kot: KOTBatch):
-    try:
-        kot_dict = kot.dict(exclude={'id'})
-        await db.kot_batches.update_one(
-            {"_id": ObjectId(kot_id)},
-            {"$set": kot_dict}
-        )
-        kot_dict['_id'] = kot_id
-        updated_kot = serialize_doc(kot_dict)
-        await broadcast_kot_update(updated_kot)
-        return updated_kot
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    )
+    
+    await broadcast_kot_update(kot_dict)
+    return MongoJSONResponse(kot_dict)
+
+@api_router.put("/kot/{kot_id}", openapi_extra=json_body(KOTBatch))
+async def update_kot(kot_id: str, kot: KOTBatch = parse_body(KOTBatch), oid: ObjectId = object_id_path('kot_id')):
+    kot_dict = kot.model_dump(exclude={'id'})
+    await kot_updates.update(oid, kot_dict)
+    kot_dict['_id'] = kot_id
+    await broadcast_kot_update(kot_dict)
+    return MongoJSONResponse(kot_dict)
 
 # ==================== Takeout Endpoints ====================
 
+# Takeout tokens come from an atomic counter document, so concurrent
+# orders never share a token and no sorted scan of orders is needed
+TAKEOUT_TOKEN_COUNTER = "takeout_token"
+
+async def next_takeout_token() -> int:
+    counter = await db.counters.find_one_and_update(
+        {"_id": TAKEOUT_TOKEN_COUNTER},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter['seq']
+
 @api_router.get("/takeout/next-token")
 async def get_next_token():
-    try:
-        last_order = await db.orders.find_one(
-            {"orderType": "takeout"},
-            sort=[("tokenNumber", -1)]
-        )
-        next_token = (last_order.get('tokenNumber', 0) + 1) if last_order else 1
-        return {"nextToken": next_token}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    counter = await db.counters.find_one({"_id": TAKEOUT_TOKEN_COUNTER})
+    next_token = (counter.get('seq', 0) + 1) if counter else 1
+    return {"nextToken": next_token}
 
 # ==================== Employees Endpoints ====================
 
 @api_router.get("/employees")
 async def get_employees():
-    try:
-        employees = await db.employees.find().to_list(100)
-        return [serialize_doc(emp) for emp in employees]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return raw_json(await dump_cursor(db.employees.find(), 100))
 
-@api_router.post("/employees")
-async def create_employee(employee: Employee):
-    try:
-        employee_dict = employee.dict(exclude={'id'})
-        result = await db.employees.insert_one(employee_dict)
-        employee_dict['_id'] = str(result.inserted_id)
-        return serialize_doc(employee_dict)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@api_router.post("/employees", openapi_extra=json_body(Employee))
+async def create_employee(employee: Employee = parse_body(Employee)):
+    employee_dict = employee.model_dump(exclude={'id'})
+    result = await db.employees.insert_one(employee_dict)
+    cache_invalidate(pin_cache_key(employee.pin))
+    employee_dict['_id'] = str(result.inserted_id)
+    return MongoJSONResponse(employee_dict)
+
+# Successful logins are cached briefly, keyed by PIN hash so raw PINs are never held as keys.
+# Only string PINs (what Employee stores) are cached: hashing str(pin) would let
+# 1234 hit the entry for "1234", which the query itself would not match.
+PIN_CACHE_TTL = 30
+
+def pin_cache_key(pin: str) -> str:
+    return 'pin:' + hashlib.sha256(pin.encode()).hexdigest()
 
 @api_router.post("/auth/login")
 async def login(data: dict):
-    try:
-        pin = data.get('pin')
+    pin = data.get('pin')
+    key = pin_cache_key(pin) if isinstance(pin, str) else None
+    body = cache_get(key) if key else None
+    if body is None:
+        generation = cache_generation(key) if key else None
         employee = await db.employees.find_one({"pin": pin})
         if not employee:
             raise HTTPException(status_code=401, detail="Invalid PIN")
-        return serialize_doc(employee)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        body = dump_json(employee)
+        if key:
+            cache_set(key, body, ttl=PIN_CACHE_TTL, generation=generation)
+    return raw_json(body)
 
 # ==================== Expenses Endpoints ====================
 
 @api_router.get("/expenses")
-async def get_expenses(start_date: Optional[str] = None, end_date: Optional[str] = None):
-    try:
-        query = {}
-        if start_date and end_date:
-            query["date"] = {
-                "$gte": datetime.fromisoformat(start_date),
-                "$lte": datetime.fromisoformat(end_date)
-            }
-        expenses = await db.expenses.find(query).sort("date", -1).to_list(1000)
-        return [serialize_doc(exp) for exp in expenses]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.post("/expenses")
-async def create_expense(expense: Expense):
-    try:
-        expense_dict = expense.dict(exclude={'id'})
-        result = await db.expenses.insert_one(expense_dict)
-        expense_dict['_id'] = str(result.inserted_id)
-        return serialize_doc(expense_dict)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_expenses(start_date: Optional[str] = None, end_date: Optional[str] = None, fields: Optional[str] = None):
+    query = {}
+    if start_date and end_date:
+        query["date"] = {
+            "$gte": datetime.fromisoformat(start_date),
+            "$lte": datetime.fromisoformat(end_date)
+        }
+    return await stream_json(db.expenses.find(query, parse_fields(fields)).sort("date", -1), 1000)
+
+@api_router.post("/expenses", openapi_extra=json_body(Expense))
+async def create_expense(expense: Expense = parse_body(Expense)):
+    expense_dict = expense.model_dump(exclude={'id'})
+    result = await db.expenses.insert_one(expense_dict)
+    expense_dict['_id'] = str(result.inserted_id)
+    return MongoJSONResponse(expense_dict)
 
 # ==================== Inventory Endpoints ====================
 
+# Update pipeline that applies a stock delta and recomputes lowStock in the same write
+def stock_change(delta: float) -> List[Dict[str, Any]]:
+    return [
+        {"$set": {"stock": {"$add": [{"$ifNull": ["$stock", 0]}, delta]}}},
+        {"$set": {"lowStock": {"$lte": ["$stock", {"$ifNull": ["$minThreshold", 0]}]}}}
+    ]
+
 @api_router.get("/inventory")
 async def get_inventory():
-    try:
-        items = await db.inventory.find().to_list(1000)
-        # Check for low stock
-        for item in items:
-            if item['stock'] <= item.get('minThreshold', 0):
-                await db.inventory.update_one(
-                    {"_id": item['_id']},
-                    {"$set": {"lowStock": True}}
-                )
-                item['lowStock'] = True
-        return [serialize_doc(item) for item in items]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.post("/inventory")
-async def create_inventory_item(item: Inventory):
-    try:
-        item_dict = item.dict(exclude={'id'})
-        item_dict['lowStock'] = item_dict['stock'] <= item_dict.get('minThreshold', 0)
-        result = await db.inventory.insert_one(item_dict)
-        item_dict['_id'] = str(result.inserted_id)
-        return serialize_doc(item_dict)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/inventory/{item_id}")
-async def update_inventory_item(item_id: str, item: Inventory):
-    try:
-        item_dict = item.dict(exclude={'id'})
-        item_dict['updatedAt'] = datetime.utcnow()
-        item_dict['lowStock'] = item_dict['stock'] <= item_dict.get('minThreshold', 0)
-        await db.inventory.update_one(
-            {"_id": ObjectId(item_id)},
-            {"$set": item_dict}
-        )
-        item_dict['_id'] = item_id
-        return serialize_doc(item_dict)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    items = await fetch_docs(db.inventory.find(), 1000)
+    # Derived for the response only; stock writes keep the stored flag current
+    for item in items:
+        item['lowStock'] = item['stock'] <= item.get('minThreshold', 0)
+    return MongoJSONResponse(items)
+
+@api_router.post("/inventory", openapi_extra=json_body(Inventory))
+async def create_inventory_item(item: Inventory = parse_body(Inventory)):
+    item_dict = item.model_dump(exclude={'id'})
+    item_dict['lowStock'] = item_dict['stock'] <= item_dict.get('minThreshold', 0)
+    result = await db.inventory.insert_one(item_dict)
+    item_dict['_id'] = str(result.inserted_id)
+    return MongoJSONResponse(item_dict)
+
+@api_router.put("/inventory/{item_id}", openapi_extra=json_body(Inventory))
+async def update_inventory_item(item_id: str, item: Inventory = parse_body(Inventory), oid: ObjectId = object_id_path('item_id')):
+    item_dict = item.model_dump(exclude={'id'})
+    item_dict['updatedAt'] = datetime.utcnow()
+    item_dict['lowStock'] = item_dict['stock'] <= item_dict.get('minThreshold', 0)
+    updated = await db.inventory.find_one_and_update(
+        {"_id": oid},
+        {"$set": item_dict},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Inventory item not found")
+    return MongoJSONResponse(updated)
 
 @api_router.post("/inventory/{item_id}/adjust")
-async def adjust_inventory(item_id: str, data: dict):
-    try:
-        adjustment_type = data.get('type')  # refill, wastage, adjustment
-        quantity = data.get('quantity', 0)
-        reason = data.get('reason', '')
-        
-        # Update stock
-        multiplier = 1 if adjustment_type in ['refill', 'adjustment'] else -1
-        await db.inventory.update_one(
-            {"_id": ObjectId(item_id)},
-            {"$inc": {"stock": quantity * multiplier}}
-        )
-        
-        # Log transaction
-        await db.inventory_transactions.insert_one({
+async def adjust_inventory(item_id: str, data: dict, oid: ObjectId = object_id_path('item_id')):
+    adjustment_type = data.get('type')  # refill, wastage, adjustment
+    quantity = data.get('quantity', 0)
+    reason = data.get('reason', '')
+    
+    # Update stock and log transaction concurrently; the update returns the
+    # post-image, so no follow-up read is needed
+    multiplier = 1 if adjustment_type in ['refill', 'adjustment'] else -1
+    item, _ = await asyncio.gather(
+        db.inventory.find_one_and_update(
+            {"_id": oid},
+            stock_change(quantity * multiplier),
+            return_document=ReturnDocument.AFTER
+        ),
+        db.inventory_transactions.insert_one({
             "inventoryId": item_id,
             "type": adjustment_type,
             "quantity": quantity,
             "reason": reason,
             "createdAt": datetime.utcnow()
         })
-        
-        # Get updated item
-        item = await db.inventory.find_one({"_id": ObjectId(item_id)})
-        return serialize_doc(item)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    )
+    return MongoJSONResponse(item)
 
 @api_router.get("/inventory/{item_id}/transactions")
 async def get_inventory_transactions(item_id: str, limit: int = 50):
-    try:
-        transactions = await db.inventory_transactions.find(
-            {"inventoryId": item_id}
-        ).sort("createdAt", -1).to_list(limit)
-        return [serialize_doc(t) for t in transactions]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    cursor = db.inventory_transactions.find(
+        {"inventoryId": item_id}
+    ).sort("createdAt", -1)
+    return raw_json(await dump_cursor(cursor, limit))
 
 # ==================== Settings Endpoints ====================
 
 @api_router.get("/settings")
 async def get_settings():
-    try:
-        settings = await db.settings.find_one()
-        if not settings:
-            default_settings = {
-                "restaurantName": "RestoPOS",
-                "currency": "₹",
-                "taxRate": 0.05,
-                "printers": [],
-                "updatedAt": datetime.utcnow()
-            }
-            result = await db.settings.insert_one(default_settings)
-            settings = await db.settings.find_one({"_id": result.inserted_id})
-        return serialize_doc(settings)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.put("/settings")
-async def update_settings(settings: Settings):
-    try:
-        settings_dict = settings.dict(exclude={'id'})
-        settings_dict['updatedAt'] = datetime.utcnow()
-        existing = await db.settings.find_one()
-        if existing:
-            await db.settings.update_one(
-                {"_id": existing['_id']},
-                {"$set": settings_dict}
-            )
-            settings_dict['_id'] = str(existing['_id'])
-        else:
-            result = await db.settings.insert_one(settings_dict)
-            settings_dict['_id'] = str(result.inserted_id)
-        return serialize_doc(settings_dict)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    body = cache_get('settings')
+    if body is not None:
+        return raw_json(body)
+    generation = cache_generation('settings')
+    settings = await db.settings.find_one()
+    if not settings:
+        # insert_one sets _id on the dict, so no re-read is needed
+        settings = {**DEFAULT_SETTINGS, "printers": [], "updatedAt": datetime.utcnow()}
+        await db.settings.insert_one(settings)
+    body = dump_json(settings)
+    cache_set('settings', body, generation=generation)
+    return raw_json(body)
+
+@api_router.put("/settings", openapi_extra=json_body(Settings))
+async def update_settings(settings: Settings = parse_body(Settings)):
+    settings_dict = settings.model_dump(exclude={'id'})
+    settings_dict['updatedAt'] = datetime.utcnow()
+    updated = await db.settings.find_one_and_update(
+        {},
+        {"$set": settings_dict},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    invalidate_settings()
+    body = dump_json(updated)
+    cache_set('settings', body)
+    return raw_json(body)
 
 # ==================== Printers Endpoints ====================
 
-@api_router.post("/printers")
-async def add_printer(printer: Printer):
-    try:
-        settings = await db.settings.find_one()
-        if not settings:
-            settings = {"printers": []}
-        
-        printer_dict = printer.dict()
-        printer_dict['lastConnected'] = datetime.utcnow()
-        
-        printers = settings.get('printers', [])
-        printers.append(printer_dict)
-        
-        await db.settings.update_one(
-            {},
-            {"$set": {"printers": printers}},
-            upsert=True
-        )
-        
-        return {"success": True, "printer": printer_dict}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@api_router.post("/printers", openapi_extra=json_body(Printer))
+async def add_printer(printer: Printer = parse_body(Printer)):
+    printer_dict = printer.model_dump()
+    printer_dict['lastConnected'] = datetime.utcnow()
+    
+    await db.settings.update_one(
+        {},
+        {"$push": {"printers": printer_dict}},
+        upsert=True
+    )
+    invalidate_settings()
+    
+    return MongoJSONResponse({"success": True, "printer": printer_dict})
 
 @api_router.get("/printers")
 async def get_printers():
-    try:
-        settings = await db.settings.find_one()
-        return settings.get('printers', []) if settings else []
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    body = cache_get('printers')
+    if body is not None:
+        return raw_json(body)
+    generation = cache_generation('printers')
+    settings = await db.settings.find_one({}, {"printers": 1})
+    body = dump_json(settings.get('printers', []) if settings else [])
+    cache_set('printers', body, generation=generation)
+    return raw_json(body)
 
 @api_router.delete("/printers/{printer_id}")
 async def delete_printer(printer_id: str):
-    try:
-        settings = await db.settings.find_one()
-        if settings:
-            printers = [p for p in settings.get('printers', []) if p['id'] != printer_id]
-            await db.settings.update_one(
-                {"_id": settings['_id']},
-                {"$set": {"printers": printers}}
-            )
-        return {"success": True}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    await db.settings.update_one(
+        {},
+        {"$pull": {"printers": {"id": printer_id}}}
+    )
+    invalidate_settings()
+    return {"success": True}
 
 # ==================== Reports Endpoints ====================
 
 @api_router.get("/reports/sales")
-async def get_sales_report(start_date: Optional[str] = None, end_date: Optional[str] = None):
-    try:
-        query = {"paymentStatus": "paid"}
-        if start_date and end_date:
-            query["createdAt"] = {
-                "$gte": datetime.fromisoformat(start_date),
-                "$lte": datetime.fromisoformat(end_date)
-            }
-        
-        orders = await db.orders.find(query).to_list(10000)
-        
-        total_sales = sum(order.get('total', 0) for order in orders)
-        total_orders = len(orders)
-        total_tax = sum(order.get('tax', 0) for order in orders)
-        
-        # Category breakdown
-        category_sales = defaultdict(float)
-        for order in orders:
-            for item in order.get('items', []):
-                menu_item = await db.menu_items.find_one({"_id": ObjectId(item['menuItemId'])})
-                if menu_item:
-                    category_sales[menu_item['category']] += item['price'] * item['quantity']
-        
-        # Top items
-        item_sales = defaultdict(lambda: {'name': '', 'quantity': 0, 'revenue': 0})
-        for order in orders:
-            for item in order.get('items', []):
-                item_sales[item['menuItemId']]['name'] = item['name']
-                item_sales[item['menuItemId']]['quantity'] += item['quantity']
-                item_sales[item['menuItemId']]['revenue'] += item['price'] * item['quantity']
-        
-        top_items = sorted(item_sales.values(), key=lambda x: x['revenue'], reverse=True)[:10]
-        
-        return {
-            "totalSales": total_sales,
-            "totalOrders": total_orders,
-            "totalTax": total_tax,
-            "averageOrderValue": total_sales / total_orders if total_orders > 0 else 0,
-            "categorySales": dict(category_sales),
-            "topItems": top_items,
-            "orders": [serialize_doc(order) for order in orders[:100]]  # Limit for performance
+async def get_sales_report(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    include_orders: bool = False,
+    skip: int = Query(0, ge=0),
+    # The page is held in memory alongside the report, unlike the streamed lists
+    limit: int = Query(100, ge=1, le=1000)
+):
+    query = {"paymentStatus": "paid"}
+    if start_date and end_date:
+        query["createdAt"] = {
+            "$gte": datetime.fromisoformat(start_date),
+            "$lte": datetime.fromisoformat(end_date)
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Totals, top items and per-item revenue come back from one $facet pipeline;
+    # per-item revenue is rolled up into categories from the cached menu lookup.
+    item_revenue = {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}
+    reads = [db.orders.aggregate([
+        {"$match": query},
+        {"$facet": {
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "totalSales": {"$sum": "$total"},
+                    "totalTax": {"$sum": "$tax"},
+                    "totalOrders": {"$sum": 1}
+                }}
+            ],
+            "topItems": [
+                {"$unwind": "$items"},
+                {"$group": {
+                    "_id": "$items.menuItemId",
+                    "name": {"$last": "$items.name"},
+                    "quantity": {"$sum": "$items.quantity"},
+                    "revenue": item_revenue
+                }},
+                {"$sort": {"revenue": -1}},
+                {"$limit": 10},
+                {"$project": {"_id": 0, "name": 1, "quantity": 1, "revenue": 1}}
+            ],
+            "itemSales": [
+                {"$unwind": "$items"},
+                {"$group": {"_id": "$items.menuItemId", "revenue": item_revenue}}
+            ]
+        }}
+    ]).to_list(1), menu_lookup()]
+    
+    # Raw orders are opt-in and paginated
+    if include_orders:
+        reads.append(fetch_docs(db.orders.find(query).sort("createdAt", -1).skip(skip).limit(limit), limit))
+    
+    (report,), lookup, *rest = await asyncio.gather(*reads)
+    orders = rest[0] if rest else []
+    
+    totals = report['totals'][0] if report['totals'] else {}
+    total_sales = totals.get('totalSales', 0)
+    total_orders = totals.get('totalOrders', 0)
+    total_tax = totals.get('totalTax', 0)
+    # Items no longer on the menu have no category and are left out
+    category_sales = defaultdict(float)
+    for row in report['itemSales']:
+        menu_item = lookup.get(row['_id'])
+        if menu_item:
+            category_sales[menu_item.get('category')] += row['revenue']
+    top_items = report['topItems']
+    
+    return MongoJSONResponse({
+        "totalSales": total_sales,
+        "totalOrders": total_orders,
+        "totalTax": total_tax,
+        "averageOrderValue": total_sales / total_orders if total_orders > 0 else 0,
+        "categorySales": category_sales,
+        "topItems": top_items,
+        "orders": orders
+    })
 
 @api_router.get("/reports/kitchen-performance")
 async def get_kitchen_performance():
-    try:
-        # Get KOTs from last 24 hours
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        kots = await db.kot_batches.find(
-            {"createdAt": {"$gte": yesterday}}
-        ).to_list(10000)
-        
-        total_kots = len(kots)
-        completed = len([k for k in kots if k['status'] == 'completed'])
-        pending = len([k for k in kots if k['status'] == 'pending'])
-        preparing = len([k for k in kots if k['status'] == 'preparing'])
-        
-        return {
-            "totalKOTs": total_kots,
-            "completed": completed,
-            "pending": pending,
-            "preparing": preparing,
-            "completionRate": (completed / total_kots * 100) if total_kots > 0 else 0
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Get KOTs from last 24 hours
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    counts = defaultdict(int)
+    async for row in db.kot_batches.aggregate([
+        {"$match": {"createdAt": {"$gte": yesterday}}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+    ]):
+        counts[row['_id']] = row['n']
+    
+    total_kots = sum(counts.values())
+    completed = counts['completed']
+    pending = counts['pending']
+    preparing = counts['preparing']
+    
+    return MongoJSONResponse({
+        "totalKOTs": total_kots,
+        "completed": completed,
+        "pending": pending,
+        "preparing": preparing,
+        "completionRate": (completed / total_kots * 100) if total_kots > 0 else 0
+    })
 
 @api_router.get("/reports/inventory-status")
 async def get_inventory_status():
-    try:
-        items = await db.inventory.find().to_list(1000)
-        
-        low_stock_items = [serialize_doc(i) for i in items if i['stock'] <= i.get('minThreshold', 0)]
-        total_value = sum(i['stock'] * i.get('price', 0) for i in items if 'price' in i)
-        
-        return {
-            "totalItems": len(items),
-            "lowStockItems": low_stock_items,
-            "lowStockCount": len(low_stock_items),
-            "totalValue": total_value
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Only low-stock items are kept; the rest are folded into the totals as they stream
+    total_items = 0
+    total_value = 0
+    low_stock_items = []
+    async for i in db.inventory.find().batch_size(STREAM_BATCH_SIZE):
+        total_items += 1
+        if 'price' in i:
+            total_value += i['stock'] * i['price']
+        if i['stock'] <= i.get('minThreshold', 0):
+            low_stock_items.append(i)
+    
+    return MongoJSONResponse({
+        "totalItems": total_items,
+        "lowStockItems": low_stock_items,
+        "lowStockCount": len(low_stock_items),
+        "totalValue": total_value
+    })
 
 # ==================== Live Dashboard ====================
 
 @api_router.get("/dashboard/live")
 async def get_live_dashboard():
-    try:
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    # Independent reads overlap; today's stats are computed server-side
+    active_orders, pending_kots, occupied_tables, today = await asyncio.gather(
         # Active orders
-        active_orders = await db.orders.find(
+        fetch_docs(db.orders.find(
             {"status": {"$in": ["pending", "preparing", "ready"]}}
-        ).to_list(100)
-        
+        ), 100),
         # Pending KOTs
-        pending_kots = await db.kot_batches.find(
+        fetch_docs(db.kot_batches.find(
             {"status": {"$in": ["pending", "preparing"]}}
-        ).to_list(100)
-        
+        ), 100),
         # Occupied tables
-        occupied_tables = await db.tables.find(
+        fetch_docs(db.tables.find(
             {"status": {"$ne": "available"}}
-        ).to_list(100)
-        
+        ), 100),
         # Today's stats
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_orders = await db.orders.find(
-            {"createdAt": {"$gte": today_start}}
-        ).to_list(10000)
-        
-        today_revenue = sum(o.get('total', 0) for o in today_orders if o.get('paymentStatus') == 'paid')
-        
-        return {
-            "activeOrders": [serialize_doc(o) for o in active_orders],
-            "pendingKOTs": [serialize_doc(k) for k in pending_kots],
-            "occupiedTables": [serialize_doc(t) for t in occupied_tables],
-            "todayStats": {
-                "totalOrders": len(today_orders),
-                "revenue": today_revenue,
-                "averageOrder": today_revenue / len(today_orders) if today_orders else 0
-            }
+        db.orders.aggregate([
+            {"$match": {"createdAt": {"$gte": today_start}}},
+            {"$facet": {
+                "count": [{"$count": "n"}],
+                "revenue": [
+                    {"$match": {"paymentStatus": "paid"}},
+                    {"$group": {"_id": None, "r": {"$sum": "$total"}}}
+                ]
+            }}
+        ]).to_list(1)
+    )
+    
+    today = today[0] if today else {}
+    today_count = today['count'][0]['n'] if today.get('count') else 0
+    today_revenue = today['revenue'][0]['r'] if today.get('revenue') else 0
+    
+    return MongoJSONResponse({
+        "activeOrders": active_orders,
+        "pendingKOTs": pending_kots,
+        "occupiedTables": occupied_tables,
+        "todayStats": {
+            "totalOrders": today_count,
+            "revenue": today_revenue,
+            "averageOrder": today_revenue / today_count if today_count else 0
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    })
 
 @api_router.get("/")
 async def root():
@@ -784,6 +1102,15 @@ async def root():
 
 app.include_router(api_router)
 
+base_openapi = app.openapi
+
+def openapi() -> Dict[str, Any]:
+    schema = base_openapi()
+    schema.setdefault("components", {}).setdefault("schemas", {}).update(BODY_SCHEMAS)
+    return schema
+
+app.openapi = openapi
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -792,6 +1119,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# List and report bodies are repetitive JSON; compress anything over 1 KB for
+# clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Mount Socket.IO
 socket_app = socketio.ASGIApp(sio, app)
 
@@ -801,6 +1132,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Startup Mongo work runs in the background, so boot never waits on or dies
+# with Mongo: while the server is unreachable the step is retried, and any
+# other failure is logged and the app carries on without it.
+STARTUP_RETRY_DELAY = 5
+startup_tasks: List[asyncio.Task] = []
+
+def background_startup(step):
+    async def run_step():
+        while True:
+            try:
+                await step()
+                return
+            except ConnectionFailure:
+                logger.warning("%s: MongoDB unreachable, retrying in %ss", step.__name__, STARTUP_RETRY_DELAY)
+                await asyncio.sleep(STARTUP_RETRY_DELAY)
+            except Exception:
+                logger.exception("%s failed; continuing without it", step.__name__)
+                return
+
+    @app.on_event("startup")
+    async def schedule():
+        startup_tasks.append(asyncio.create_task(run_step()))
+
+    return step
+
+@background_startup
+async def create_indexes():
+    await db.orders.create_index([("createdAt", -1)])
+    await db.orders.create_index([("paymentStatus", 1), ("createdAt", -1)])
+    await db.orders.create_index([("status", 1), ("createdAt", -1)])
+    await db.orders.create_index([("orderType", 1), ("tokenNumber", -1)])
+    try:
+        await db.tables.create_index("tableNumber", unique=True)
+    except OperationFailure as e:
+        if e.code != 11000:
+            raise
+        # Older databases may hold tables double-inserted by the former lazy
+        # bootstrap; index them without the constraint until deduplicated
+        logger.warning("Duplicate tableNumber values found; creating a non-unique index")
+        await db.tables.create_index("tableNumber")
+    # Not unique: existing deployments may already hold duplicate PINs
+    await db.employees.create_index("pin")
+    await db.kot_batches.create_index([("createdAt", -1)])
+    await db.kot_batches.create_index([("status", 1), ("createdAt", -1)])
+    await db.expenses.create_index([("date", -1)])
+    await db.inventory_transactions.create_index([("inventoryId", 1), ("createdAt", -1)])
+    await db.menu_items.create_index("category")
+
+@background_startup
+async def seed_default_tables():
+    if await db.tables.estimated_document_count():
+        return
+    # Upserts keep the seed idempotent when several workers start at once
+    now = datetime.utcnow()
+    await db.tables.bulk_write([
+        UpdateOne(
+            {"tableNumber": i},
+            {"$setOnInsert": {**DEFAULT_TABLE, "updatedAt": now}},
+            upsert=True
+        )
+        for i in range(1, DEFAULT_TABLE_COUNT + 1)
+    ], ordered=False)
+
+@background_startup
+async def seed_token_counter():
+    # Start the counter from the highest token already issued; $max keeps this idempotent
+    last_order = await db.orders.find_one(
+        {"orderType": "takeout"},
+        sort=[("tokenNumber", -1)],
+        projection={"tokenNumber": 1}
+    )
+    await db.counters.update_one(
+        {"_id": TAKEOUT_TOKEN_COUNTER},
+        {"$max": {"seq": (last_order or {}).get('tokenNumber') or 0}},
+        upsert=True
+    )
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in startup_tasks:
+        task.cancel()
+    await order_updates.stop()
+    await kot_updates.stop()
     client.close()
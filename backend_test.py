@@ -4,13 +4,18 @@ RestoPOS Backend API Test Suite
 Tests all backend endpoints with focus on critical order flow
 """
 
-import requests
-import json
-from datetime import datetime
+import argparse
+import asyncio
+import aiohttp
+import contextvars
+import orjson
+import time
+from functools import lru_cache, wraps
 import sys
 import os
 
 # Get backend URL from frontend .env file
+@lru_cache(maxsize=1)
 def get_backend_url():
     try:
         with open('/app/frontend/.env', 'r') as f:
@@ -25,10 +30,70 @@ def get_backend_url():
 BASE_URL = get_backend_url()
 print(f"Testing backend at: {BASE_URL}")
 
+# Transient gateway errors are retried with backoff, for idempotent methods only
+RETRY_STATUSES = {502, 503, 504}
+RETRY_METHODS = {"GET", "PUT", "DELETE"}
+MAX_RETRIES = 2
+
+ORDER_QUANTITIES = (2, 1, 1)
+
+# Report lines of a section running as its own task, kept apart from the
+# lines of sections running alongside it
+section_lines = contextvars.ContextVar('section_lines', default=None)
+
+MAX_ERROR_BODY = 500
+
+# Matches the backend's GZipMiddleware minimum_size
+COMPRESS_MIN_SIZE = 1000
+
+# --record/--replay fixtures. Only idempotent reads outside the order flow are
+# replayed; the order -> KOT -> table chain always hits the live server.
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend_test_fixtures.json')
+ORDERS_COUNT_PATH = "/orders?fields=_id"
+REPLAYABLE_PATHS = {ORDERS_COUNT_PATH, "/employees", "/expenses", "/inventory", "/settings"}
+
+class Reply:
+    """Status, headers and body of a response, read before its connection is released.
+    Replayed fixtures carry no headers."""
+    __slots__ = ('status', 'headers', 'body')
+    
+    def __init__(self, status, body, headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers
+
+def group_by_status(tables):
+    """Bucket tables by status once so each lookup is a dict hit"""
+    by_status = {}
+    for table in tables:
+        by_status.setdefault(table.get('status'), []).append(table)
+    return by_status
+
+def guarded(name, default=None, prefix="Error"):
+    """Log any exception a test raises as a failure under the test's result name"""
+    def wrap(test):
+        @wraps(test)
+        async def run(self, *args, **kwargs):
+            try:
+                return await test(self, *args, **kwargs)
+            except Exception as e:
+                self.log_result(name, False, f"{prefix}: {str(e)}")
+                return default() if callable(default) else default
+        return run
+    return wrap
+
 class RestoPOSAPITester:
-    def __init__(self):
+    __slots__ = ('base_url', 'session', 'mode', 'fixtures', 'replayed', 'response_cache',
+                 'log_lines', 'test_results', 'created_items')
+    
+    def __init__(self, session, mode=None, fixtures=None):
         self.base_url = BASE_URL
-        self.session = requests.Session()
+        self.session = session
+        self.mode = mode
+        self.fixtures = fixtures or {}
+        self.replayed = []
+        self.response_cache = {}
+        self.log_lines = []
         self.test_results = []
         self.created_items = {
             'menu_items': [],
@@ -39,309 +104,302 @@ class RestoPOSAPITester:
             'inventory': []
         }
         
-    def log_result(self, test_name, success, message, response_data=None):
+    async def request(self, method, path, **kwargs):
+        """Send a request and read it into a Reply, returning the connection to the pool"""
+        if 'json' in kwargs:
+            # Encode once with orjson instead of aiohttp's stdlib json.dumps
+            kwargs['data'] = orjson.dumps(kwargs.pop('json'))
+            kwargs['headers'] = {'Content-Type': 'application/json', **kwargs.get('headers', {})}
+        replayable = method == "GET" and path in REPLAYABLE_PATHS
+        if replayable and self.mode == 'replay' and path in self.fixtures:
+            self.replayed.append(path)
+            fixture = self.fixtures[path]
+            return Reply(fixture["status"], fixture["body"].encode())
+        retries = MAX_RETRIES if method in RETRY_METHODS else 0
+        for attempt in range(retries + 1):
+            async with self.session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+                reply = Reply(response.status, await response.read(), response.headers)
+            if reply.status not in RETRY_STATUSES or attempt == retries:
+                break
+            await asyncio.sleep(0.1 * 2 ** attempt)
+        if replayable and self.mode == 'record':
+            self.fixtures[path] = {"status": reply.status, "body": reply.body.decode()}
+        return reply
+            
+    async def cached_get(self, path, ttl=5):
+        """GET through a short-lived cache; writes to a path drop its entry"""
+        now = time.monotonic()
+        entry = self.response_cache.get(path)
+        if entry and now - entry[0] < ttl:
+            return entry[1]
+        reply = await self.request("GET", path)
+        if reply.status == 200:
+            self.response_cache[path] = (now, reply)
+        return reply
+        
+    def invalidate(self, path):
+        self.response_cache.pop(path, None)
+        
+    def out(self, line):
+        """Buffer a report line; flush() writes the whole report at once"""
+        lines = section_lines.get()
+        (self.log_lines if lines is None else lines).append(line)
+        
+    def flush(self):
+        sys.stdout.write("\n".join(self.log_lines) + "\n")
+        sys.stdout.flush()
+        self.log_lines.clear()
+        
+    def log_result(self, test_name, success, message):
         """Log test result"""
         status = "✅ PASS" if success else "❌ FAIL"
-        print(f"{status} {test_name}: {message}")
+        self.out(f"{status} {test_name}: {message}")
         self.test_results.append({
             'test': test_name,
             'success': success,
-            'message': message,
-            'response_data': response_data
+            'message': message
         })
         
-    def test_root_endpoint(self):
+    async def call(self, name, method, path, cached=False, **kwargs):
+        """Send one request and decode a 200 body; other statuses are logged and yield None.
+        Exceptions propagate to the calling test's guard."""
+        if cached:
+            reply = await self.cached_get(path)
+        else:
+            reply = await self.request(method, path, **kwargs)
+        if reply.status == 200:
+            self.check_compressed(name, reply)
+            # orjson parses the body bytes directly, skipping the str decode
+            return orjson.loads(reply.body)
+        # Error pages can be large; the report only needs their head
+        head = reply.body[:MAX_ERROR_BODY].decode(errors='replace')
+        self.log_result(name, False, f"Status {reply.status}: {head}")
+        return None
+        
+    def check_compressed(self, name, reply):
+        """Warn when a large body came back uncompressed (server gzip misconfigured)"""
+        size = len(reply.body)
+        if reply.headers is not None and size > COMPRESS_MIN_SIZE and 'Content-Encoding' not in reply.headers:
+            self.out(f"⚠️ WARN {name}: {size} byte response was not compressed")
+        
+    async def create(self, name, path, payload, bucket, missing_id="No ID returned in response"):
+        """POST a new document and record its id under created_items[bucket]"""
+        created = await self.call(name, "POST", path, json=payload)
+        if created is None:
+            return None
+        if '_id' not in created:
+            self.log_result(name, False, missing_id)
+            return None
+        self.created_items[bucket].append(created['_id'])
+        return created
+        
+    @guarded("Root Endpoint", False, prefix="Connection error")
+    async def test_root_endpoint(self):
         """Test root API endpoint"""
-        try:
-            response = self.session.get(f"{self.base_url}/")
-            if response.status_code == 200:
-                data = response.json()
-                if 'message' in data and 'RestoPOS' in data['message']:
-                    self.log_result("Root Endpoint", True, "API root accessible")
-                    return True
-                else:
-                    self.log_result("Root Endpoint", False, f"Unexpected response: {data}")
-            else:
-                self.log_result("Root Endpoint", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("Root Endpoint", False, f"Connection error: {str(e)}")
+        data = await self.call("Root Endpoint", "GET", "/")
+        if data is None:
+            return False
+        if 'message' in data and 'RestoPOS' in data['message']:
+            self.log_result("Root Endpoint", True, "API root accessible")
+            return True
+        self.log_result("Root Endpoint", False, f"Unexpected response: {data}")
         return False
         
-    def test_get_menu(self):
+    @guarded("GET Menu", list)
+    async def test_get_menu(self):
         """Test GET /api/menu"""
-        try:
-            response = self.session.get(f"{self.base_url}/menu")
-            if response.status_code == 200:
-                menu_items = response.json()
-                self.log_result("GET Menu", True, f"Retrieved {len(menu_items)} menu items")
-                return menu_items
-            else:
-                self.log_result("GET Menu", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("GET Menu", False, f"Error: {str(e)}")
-        return []
+        menu_items = await self.call("GET Menu", "GET", "/menu", cached=True)
+        if menu_items is None:
+            return []
+        self.log_result("GET Menu", True, f"Retrieved {len(menu_items)} menu items")
+        return menu_items
         
-    def test_create_menu_item(self):
+    @guarded("POST Menu")
+    async def test_create_menu_item(self):
         """Test POST /api/menu"""
-        try:
-            new_item = {
-                "name": "Butter Chicken",
-                "category": "Main Course",
-                "price": 299.0,
-                "emoji": "🍛",
-                "stock": 50,
-                "soldOut": False,
-                "description": "Creamy tomato-based chicken curry"
-            }
-            
-            response = self.session.post(f"{self.base_url}/menu", json=new_item)
-            if response.status_code == 200:
-                created_item = response.json()
-                if '_id' in created_item:
-                    self.created_items['menu_items'].append(created_item['_id'])
-                    self.log_result("POST Menu", True, f"Created menu item: {created_item['name']}")
-                    return created_item
-                else:
-                    self.log_result("POST Menu", False, "No ID returned in response")
-            else:
-                self.log_result("POST Menu", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("POST Menu", False, f"Error: {str(e)}")
-        return None
+        new_item = {
+            "name": "Butter Chicken",
+            "category": "Main Course",
+            "price": 299.0,
+            "emoji": "🍛",
+            "stock": 50,
+            "soldOut": False,
+            "description": "Creamy tomato-based chicken curry"
+        }
         
-    def test_update_menu_item(self, item_id):
+        created_item = await self.create("POST Menu", "/menu", new_item, 'menu_items')
+        if created_item:
+            self.invalidate("/menu")
+            self.log_result("POST Menu", True, f"Created menu item: {created_item['name']}")
+        return created_item
+        
+    @guarded("PUT Menu")
+    async def test_update_menu_item(self, item_id):
         """Test PUT /api/menu/{id}"""
-        try:
-            updated_item = {
-                "name": "Butter Chicken Deluxe",
-                "category": "Main Course", 
-                "price": 349.0,
-                "emoji": "🍛",
-                "stock": 30,
-                "soldOut": False,
-                "description": "Premium creamy tomato-based chicken curry with extra butter"
-            }
-            
-            response = self.session.put(f"{self.base_url}/menu/{item_id}", json=updated_item)
-            if response.status_code == 200:
-                updated = response.json()
-                self.log_result("PUT Menu", True, f"Updated menu item: {updated.get('name', 'Unknown')}")
-                return updated
-            else:
-                self.log_result("PUT Menu", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("PUT Menu", False, f"Error: {str(e)}")
-        return None
+        updated_item = {
+            "name": "Butter Chicken Deluxe",
+            "category": "Main Course", 
+            "price": 349.0,
+            "emoji": "🍛",
+            "stock": 30,
+            "soldOut": False,
+            "description": "Premium creamy tomato-based chicken curry with extra butter"
+        }
+        
+        updated = await self.call("PUT Menu", "PUT", f"/menu/{item_id}", json=updated_item)
+        if updated is not None:
+            self.invalidate("/menu")
+            self.log_result("PUT Menu", True, f"Updated menu item: {updated.get('name', 'Unknown')}")
+        return updated
         
-    def test_delete_menu_item(self, item_id):
+    @guarded("DELETE Menu", False)
+    async def test_delete_menu_item(self, item_id):
         """Test DELETE /api/menu/{id}"""
-        try:
-            response = self.session.delete(f"{self.base_url}/menu/{item_id}")
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    self.log_result("DELETE Menu", True, "Menu item deleted successfully")
-                    return True
-                else:
-                    self.log_result("DELETE Menu", False, "Delete operation failed")
-            else:
-                self.log_result("DELETE Menu", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("DELETE Menu", False, f"Error: {str(e)}")
+        result = await self.call("DELETE Menu", "DELETE", f"/menu/{item_id}")
+        if result is None:
+            return False
+        if result.get('success'):
+            self.invalidate("/menu")
+            self.log_result("DELETE Menu", True, "Menu item deleted successfully")
+            return True
+        self.log_result("DELETE Menu", False, "Delete operation failed")
         return False
         
-    def test_get_tables(self):
+    @guarded("GET Tables", list)
+    async def test_get_tables(self):
         """Test GET /api/tables"""
-        try:
-            response = self.session.get(f"{self.base_url}/tables")
-            if response.status_code == 200:
-                tables = response.json()
-                available_tables = [t for t in tables if t.get('status') == 'available']
-                self.log_result("GET Tables", True, f"Retrieved {len(tables)} tables, {len(available_tables)} available")
-                return tables
-            else:
-                self.log_result("GET Tables", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("GET Tables", False, f"Error: {str(e)}")
-        return []
+        tables = await self.call("GET Tables", "GET", "/tables", cached=True)
+        if tables is None:
+            return []
+        available_tables = [t for t in tables if t.get('status') == 'available']
+        self.log_result("GET Tables", True, f"Retrieved {len(tables)} tables, {len(available_tables)} available")
+        return tables
         
-    def test_get_orders(self):
+    @guarded("GET Orders", list)
+    async def test_get_orders(self):
         """Test GET /api/orders"""
-        try:
-            response = self.session.get(f"{self.base_url}/orders")
-            if response.status_code == 200:
-                orders = response.json()
-                self.log_result("GET Orders", True, f"Retrieved {len(orders)} orders")
-                return orders
-            else:
-                self.log_result("GET Orders", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("GET Orders", False, f"Error: {str(e)}")
-        return []
+        # Only the count is checked, so ask the server for ids alone
+        orders = await self.call("GET Orders", "GET", ORDERS_COUNT_PATH)
+        if orders is None:
+            return []
+        self.log_result("GET Orders", True, f"Retrieved {len(orders)} orders")
+        return orders
         
-    def test_create_order(self, menu_items, tables):
+    @guarded("POST Orders")
+    async def test_create_order(self, menu_items, tables_by_status):
         """Test POST /api/orders - Critical order flow test"""
-        try:
-            if not menu_items or len(menu_items) < 2:
-                self.log_result("POST Orders", False, "Need at least 2 menu items for testing")
-                return None
-                
-            if not tables:
-                self.log_result("POST Orders", False, "No tables available for testing")
-                return None
-                
-            # Find available table
-            available_table = None
-            for table in tables:
-                if table.get('status') == 'available':
-                    available_table = table
-                    break
-                    
-            if not available_table:
-                self.log_result("POST Orders", False, "No available tables found")
-                return None
-                
-            # Create order with 2-3 menu items
-            order_items = []
-            total = 0
+        if not menu_items or len(menu_items) < 2:
+            self.log_result("POST Orders", False, "Need at least 2 menu items for testing")
+            return None
             
-            for i, menu_item in enumerate(menu_items[:3]):  # Take first 3 items
-                quantity = 2 if i == 0 else 1  # First item quantity 2, others 1
-                item_total = menu_item['price'] * quantity
-                total += item_total
-                
-                order_items.append({
-                    "menuItemId": menu_item['_id'],
-                    "name": menu_item['name'],
-                    "quantity": quantity,
-                    "price": menu_item['price'],
-                    "modifiers": [],
-                    "instructions": f"Special instructions for {menu_item['name']}" if i == 0 else ""
-                })
+        if not tables_by_status:
+            self.log_result("POST Orders", False, "No tables available for testing")
+            return None
+            
+        # Find available table
+        available_table = next(iter(tables_by_status.get('available', ())), None)
                 
-            new_order = {
-                "orderType": "dine-in",
-                "tableNumber": available_table['tableNumber'],
-                "items": order_items,
-                "status": "pending",
-                "subtotal": total,
-                "tax": total * 0.05,  # 5% tax
-                "total": total * 1.05,
-                "paymentMethod": None,
-                "paymentStatus": "unpaid",
-                "kotSent": False
-            }
+        if not available_table:
+            self.log_result("POST Orders", False, "No available tables found")
+            return None
             
-            response = self.session.post(f"{self.base_url}/orders", json=new_order)
-            if response.status_code == 200:
-                created_order = response.json()
-                if '_id' in created_order:
-                    self.created_items['orders'].append(created_order['_id'])
-                    self.log_result("POST Orders", True, 
-                                  f"Created order {created_order['_id']} for table {available_table['tableNumber']} with {len(order_items)} items")
-                    return created_order
-                else:
-                    self.log_result("POST Orders", False, "No ID returned in response")
-            else:
-                self.log_result("POST Orders", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("POST Orders", False, f"Error: {str(e)}")
-        return None
+        # Create order with 2-3 menu items: first item quantity 2, others 1
+        picks = list(zip(ORDER_QUANTITIES, menu_items[:3]))
+        total = sum(menu_item['price'] * quantity for quantity, menu_item in picks)
+        order_items = [{
+            "menuItemId": menu_item['_id'],
+            "name": menu_item['name'],
+            "quantity": quantity,
+            "price": menu_item['price'],
+            "modifiers": [],
+            "instructions": f"Special instructions for {menu_item['name']}" if i == 0 else ""
+        } for i, (quantity, menu_item) in enumerate(picks)]
+            
+        new_order = {
+            "orderType": "dine-in",
+            "tableNumber": available_table['tableNumber'],
+            "items": order_items,
+            "status": "pending",
+            "subtotal": total,
+            "tax": total * 0.05,  # 5% tax
+            "total": total * 1.05,
+            "paymentMethod": None,
+            "paymentStatus": "unpaid",
+            "kotSent": False
+        }
+        
+        created_order = await self.create("POST Orders", "/orders", new_order, 'orders')
+        if created_order:
+            # The order occupies its table, so the next table read must be fresh
+            self.invalidate("/tables")
+            self.log_result("POST Orders", True, 
+                          f"Created order {created_order['_id']} for table {available_table['tableNumber']} with {len(order_items)} items")
+        return created_order
         
-    def test_create_kot(self, order):
+    @guarded("POST KOT")
+    async def test_create_kot(self, order):
         """Test POST /api/kot - Critical KOT flow test"""
-        try:
-            if not order:
-                self.log_result("POST KOT", False, "No order provided for KOT creation")
-                return None
-                
-            kot_data = {
-                "orderId": order['_id'],
-                "orderType": order['orderType'],
-                "tableNumber": order.get('tableNumber'),
-                "tokenNumber": order.get('tokenNumber'),
-                "items": order['items'],
-                "status": "pending"
-            }
+        if not order:
+            self.log_result("POST KOT", False, "No order provided for KOT creation")
+            return None
             
-            response = self.session.post(f"{self.base_url}/kot", json=kot_data)
-            if response.status_code == 200:
-                created_kot = response.json()
-                if '_id' in created_kot:
-                    self.created_items['kot_batches'].append(created_kot['_id'])
-                    self.log_result("POST KOT", True, 
-                                  f"Created KOT {created_kot['_id']} for order {order['_id']}")
-                    return created_kot
-                else:
-                    self.log_result("POST KOT", False, "No ID returned in response")
-            else:
-                self.log_result("POST KOT", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("POST KOT", False, f"Error: {str(e)}")
-        return None
+        kot_data = {
+            "orderId": order['_id'],
+            "orderType": order['orderType'],
+            "tableNumber": order.get('tableNumber'),
+            "tokenNumber": order.get('tokenNumber'),
+            "items": order['items'],
+            "status": "pending"
+        }
         
-    def test_get_kot(self):
+        created_kot = await self.create("POST KOT", "/kot", kot_data, 'kot_batches')
+        if created_kot:
+            self.invalidate("/kot")
+            self.log_result("POST KOT", True, 
+                          f"Created KOT {created_kot['_id']} for order {order['_id']}")
+        return created_kot
+        
+    @guarded("GET KOT", list)
+    async def test_get_kot(self):
         """Test GET /api/kot"""
-        try:
-            response = self.session.get(f"{self.base_url}/kot")
-            if response.status_code == 200:
-                kot_batches = response.json()
-                pending_kots = [k for k in kot_batches if k.get('status') == 'pending']
-                self.log_result("GET KOT", True, 
-                              f"Retrieved {len(kot_batches)} KOT batches, {len(pending_kots)} pending")
-                return kot_batches
-            else:
-                self.log_result("GET KOT", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("GET KOT", False, f"Error: {str(e)}")
-        return []
+        kot_batches = await self.call("GET KOT", "GET", "/kot", cached=True)
+        if kot_batches is None:
+            return []
+        pending_kots = [k for k in kot_batches if k.get('status') == 'pending']
+        self.log_result("GET KOT", True, 
+                      f"Retrieved {len(kot_batches)} KOT batches, {len(pending_kots)} pending")
+        return kot_batches
         
-    def test_update_kot_status(self, kot_id):
+    @guarded("PUT KOT", False)
+    async def test_update_kot_status(self, kot_id):
         """Test PUT /api/kot/{id} - Update KOT status"""
-        try:
-            # First update to 'preparing'
-            update_data = {
-                "orderId": "test",  # Will be overridden by existing data
-                "orderType": "dine-in",
-                "items": [],
-                "status": "preparing"
-            }
-            
-            response = self.session.put(f"{self.base_url}/kot/{kot_id}", json=update_data)
-            if response.status_code == 200:
-                self.log_result("PUT KOT (preparing)", True, f"Updated KOT {kot_id} to preparing")
-                
-                # Then update to 'completed'
-                update_data["status"] = "completed"
-                response = self.session.put(f"{self.base_url}/kot/{kot_id}", json=update_data)
-                if response.status_code == 200:
-                    self.log_result("PUT KOT (completed)", True, f"Updated KOT {kot_id} to completed")
-                    return True
-                else:
-                    self.log_result("PUT KOT (completed)", False, f"Status {response.status_code}: {response.text}")
-            else:
-                self.log_result("PUT KOT (preparing)", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("PUT KOT", False, f"Error: {str(e)}")
-        return False
+        # First update to 'preparing', then to 'completed'
+        update_data = {
+            "orderId": "test",  # Will be overridden by existing data
+            "orderType": "dine-in",
+            "items": [],
+            "status": "preparing"
+        }
+        
+        for status in ("preparing", "completed"):
+            update_data["status"] = status
+            name = f"PUT KOT ({status})"
+            if await self.call(name, "PUT", f"/kot/{kot_id}", json=update_data) is None:
+                return False
+            self.invalidate("/kot")
+            self.log_result(name, True, f"Updated KOT {kot_id} to {status}")
+        return True
         
-    def test_table_status_update(self, tables):
+    async def test_table_status_update(self, tables_by_status):
         """Test table status updates"""
         try:
             # Find an occupied table (should be from our order)
-            occupied_table = None
-            for table in tables:
-                if table.get('status') == 'occupied':
-                    occupied_table = table
-                    break
+            occupied_table = next(iter(tables_by_status.get('occupied', ())), None)
                     
             if not occupied_table:
                 # Get fresh table data
-                fresh_tables = self.test_get_tables()
-                for table in fresh_tables:
-                    if table.get('status') == 'occupied':
-                        occupied_table = table
-                        break
+                fresh_tables = group_by_status(await self.test_get_tables())
+                occupied_table = next(iter(fresh_tables.get('occupied', ())), None)
                         
             if occupied_table:
                 self.log_result("Table Status Update", True, 
@@ -353,224 +411,228 @@ class RestoPOSAPITester:
             self.log_result("Table Status Update", False, f"Error: {str(e)}")
         return False
         
-    def test_employees_endpoints(self):
+    @guarded("Employees Endpoints", False)
+    async def test_employees_endpoints(self):
         """Test employee endpoints"""
-        try:
-            # Test GET employees
-            response = self.session.get(f"{self.base_url}/employees")
-            if response.status_code == 200:
-                employees = response.json()
-                self.log_result("GET Employees", True, f"Retrieved {len(employees)} employees")
-                
-                # Test POST employee
-                new_employee = {
-                    "name": "John Doe",
-                    "role": "Waiter",
-                    "pin": "5678",
-                    "phone": "9876543210",
-                    "salary": 25000.0
-                }
-                
-                response = self.session.post(f"{self.base_url}/employees", json=new_employee)
-                if response.status_code == 200:
-                    created_emp = response.json()
-                    if '_id' in created_emp:
-                        self.created_items['employees'].append(created_emp['_id'])
-                        self.log_result("POST Employees", True, f"Created employee: {created_emp['name']}")
-                        return True
-                    else:
-                        self.log_result("POST Employees", False, "No ID returned")
-                else:
-                    self.log_result("POST Employees", False, f"Status {response.status_code}: {response.text}")
-            else:
-                self.log_result("GET Employees", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("Employees Endpoints", False, f"Error: {str(e)}")
+        employees = await self.call("GET Employees", "GET", "/employees")
+        if employees is None:
+            return False
+        self.log_result("GET Employees", True, f"Retrieved {len(employees)} employees")
+        
+        new_employee = {
+            "name": "John Doe",
+            "role": "Waiter",
+            "pin": "5678",
+            "phone": "9876543210",
+            "salary": 25000.0
+        }
+        
+        created_emp = await self.create("POST Employees", "/employees", new_employee, 'employees', missing_id="No ID returned")
+        if created_emp:
+            self.log_result("POST Employees", True, f"Created employee: {created_emp['name']}")
+            return True
         return False
         
-    def test_expenses_endpoints(self):
+    @guarded("Expenses Endpoints", False)
+    async def test_expenses_endpoints(self):
         """Test expense endpoints"""
-        try:
-            # Test GET expenses
-            response = self.session.get(f"{self.base_url}/expenses")
-            if response.status_code == 200:
-                expenses = response.json()
-                self.log_result("GET Expenses", True, f"Retrieved {len(expenses)} expenses")
-                
-                # Test POST expense
-                new_expense = {
-                    "category": "Utilities",
-                    "amount": 5000.0,
-                    "description": "Monthly electricity bill"
-                }
-                
-                response = self.session.post(f"{self.base_url}/expenses", json=new_expense)
-                if response.status_code == 200:
-                    created_exp = response.json()
-                    if '_id' in created_exp:
-                        self.created_items['expenses'].append(created_exp['_id'])
-                        self.log_result("POST Expenses", True, f"Created expense: {created_exp['category']}")
-                        return True
-                    else:
-                        self.log_result("POST Expenses", False, "No ID returned")
-                else:
-                    self.log_result("POST Expenses", False, f"Status {response.status_code}: {response.text}")
-            else:
-                self.log_result("GET Expenses", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("Expenses Endpoints", False, f"Error: {str(e)}")
+        expenses = await self.call("GET Expenses", "GET", "/expenses")
+        if expenses is None:
+            return False
+        self.log_result("GET Expenses", True, f"Retrieved {len(expenses)} expenses")
+        
+        new_expense = {
+            "category": "Utilities",
+            "amount": 5000.0,
+            "description": "Monthly electricity bill"
+        }
+        
+        created_exp = await self.create("POST Expenses", "/expenses", new_expense, 'expenses', missing_id="No ID returned")
+        if created_exp:
+            self.log_result("POST Expenses", True, f"Created expense: {created_exp['category']}")
+            return True
         return False
         
-    def test_inventory_endpoints(self):
+    @guarded("Inventory Endpoints", False)
+    async def test_inventory_endpoints(self):
         """Test inventory endpoints"""
-        try:
-            # Test GET inventory
-            response = self.session.get(f"{self.base_url}/inventory")
-            if response.status_code == 200:
-                inventory = response.json()
-                self.log_result("GET Inventory", True, f"Retrieved {len(inventory)} inventory items")
-                
-                # Test POST inventory
-                new_item = {
-                    "name": "Chicken Breast",
-                    "category": "Meat",
-                    "unit": "kg",
-                    "stock": 50.0,
-                    "minThreshold": 10.0
-                }
-                
-                response = self.session.post(f"{self.base_url}/inventory", json=new_item)
-                if response.status_code == 200:
-                    created_item = response.json()
-                    if '_id' in created_item:
-                        self.created_items['inventory'].append(created_item['_id'])
-                        self.log_result("POST Inventory", True, f"Created inventory item: {created_item['name']}")
-                        return True
-                    else:
-                        self.log_result("POST Inventory", False, "No ID returned")
-                else:
-                    self.log_result("POST Inventory", False, f"Status {response.status_code}: {response.text}")
-            else:
-                self.log_result("GET Inventory", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("Inventory Endpoints", False, f"Error: {str(e)}")
+        inventory = await self.call("GET Inventory", "GET", "/inventory")
+        if inventory is None:
+            return False
+        self.log_result("GET Inventory", True, f"Retrieved {len(inventory)} inventory items")
+        
+        new_item = {
+            "name": "Chicken Breast",
+            "category": "Meat",
+            "unit": "kg",
+            "stock": 50.0,
+            "minThreshold": 10.0
+        }
+        
+        created_item = await self.create("POST Inventory", "/inventory", new_item, 'inventory', missing_id="No ID returned")
+        if created_item:
+            self.log_result("POST Inventory", True, f"Created inventory item: {created_item['name']}")
+            return True
         return False
         
-    def test_settings_endpoints(self):
+    @guarded("Settings Endpoints", False)
+    async def test_settings_endpoints(self):
         """Test settings endpoints"""
-        try:
-            # Test GET settings
-            response = self.session.get(f"{self.base_url}/settings")
-            if response.status_code == 200:
-                settings = response.json()
-                self.log_result("GET Settings", True, f"Retrieved settings: {settings.get('restaurantName', 'Unknown')}")
-                
-                # Test PUT settings
-                updated_settings = {
-                    "restaurantName": "RestoPOS Test Restaurant",
-                    "currency": "₹",
-                    "taxRate": 0.08,
-                    "printers": []
-                }
-                
-                response = self.session.put(f"{self.base_url}/settings", json=updated_settings)
-                if response.status_code == 200:
-                    updated = response.json()
-                    self.log_result("PUT Settings", True, f"Updated settings: {updated.get('restaurantName', 'Unknown')}")
-                    return True
-                else:
-                    self.log_result("PUT Settings", False, f"Status {response.status_code}: {response.text}")
-            else:
-                self.log_result("GET Settings", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("Settings Endpoints", False, f"Error: {str(e)}")
-        return False
+        settings = await self.call("GET Settings", "GET", "/settings")
+        if settings is None:
+            return False
+        self.log_result("GET Settings", True, f"Retrieved settings: {settings.get('restaurantName', 'Unknown')}")
         
-    def test_auth_login(self):
+        updated_settings = {
+            "restaurantName": "RestoPOS Test Restaurant",
+            "currency": "₹",
+            "taxRate": 0.08,
+            "printers": []
+        }
+        
+        updated = await self.call("PUT Settings", "PUT", "/settings", json=updated_settings)
+        if updated is None:
+            return False
+        self.log_result("PUT Settings", True, f"Updated settings: {updated.get('restaurantName', 'Unknown')}")
+        return True
+        
+    @guarded("Auth Login", False)
+    async def test_auth_login(self):
         """Test authentication login"""
-        try:
-            # Test with demo PIN
-            login_data = {"pin": "1234"}
-            response = self.session.post(f"{self.base_url}/auth/login", json=login_data)
-            if response.status_code == 200:
-                employee = response.json()
-                self.log_result("Auth Login", True, f"Login successful for employee: {employee.get('name', 'Unknown')}")
-                return True
-            else:
-                self.log_result("Auth Login", False, f"Status {response.status_code}: {response.text}")
-        except Exception as e:
-            self.log_result("Auth Login", False, f"Error: {str(e)}")
-        return False
+        # Test with demo PIN
+        employee = await self.call("Auth Login", "POST", "/auth/login", json={"pin": "1234"})
+        if employee is None:
+            return False
+        self.log_result("Auth Login", True, f"Login successful for employee: {employee.get('name', 'Unknown')}")
+        return True
         
-    def run_all_tests(self):
+    async def menu_management_flow(self):
+        """Create, update and delete a menu item; returns the section's report lines"""
+        lines = []
+        section_lines.set(lines)
+        created_menu_item = await self.test_create_menu_item()
+        if created_menu_item:
+            await self.test_update_menu_item(created_menu_item['_id'])
+            await self.test_delete_menu_item(created_menu_item['_id'])
+        return lines
+        
+    async def run_all_tests(self):
         """Run all tests in priority order"""
-        print("=" * 60)
-        print("RestoPOS Backend API Test Suite")
-        print("=" * 60)
+        self.out("=" * 60)
+        self.out("RestoPOS Backend API Test Suite")
+        self.out("=" * 60)
         
         # Priority 1: Core Order Flow (CRITICAL)
-        print("\n🔥 PRIORITY 1: CORE ORDER FLOW (CRITICAL)")
-        print("-" * 40)
+        self.out("\n🔥 PRIORITY 1: CORE ORDER FLOW (CRITICAL)")
+        self.out("-" * 40)
         
         # Basic connectivity
-        if not self.test_root_endpoint():
-            print("❌ Cannot connect to API - stopping tests")
+        if not await self.test_root_endpoint():
+            self.out("❌ Cannot connect to API - stopping tests")
             return
             
-        # Get initial data
-        menu_items = self.test_get_menu()
-        tables = self.test_get_tables()
+        # Get initial data; the root check warmed a pooled connection, and the
+        # two reads overlap on it and a second one
+        menu_items, tables = await asyncio.gather(self.test_get_menu(), self.test_get_tables())
+        tables_by_status = group_by_status(tables)
+        
+        # Menu CRUD doesn't touch tables or the fetched menu, so it runs
+        # alongside the order -> KOT chain
+        menu_flow = asyncio.create_task(self.menu_management_flow())
         
         # Test complete order flow
-        order = self.test_create_order(menu_items, tables)
+        order = await self.test_create_order(menu_items, tables_by_status)
         if order:
-            kot = self.test_create_kot(order)
+            kot = await self.test_create_kot(order)
             if kot:
-                self.test_get_kot()
-                self.test_update_kot_status(kot['_id'])
-            self.test_table_status_update(tables)
+                await self.test_get_kot()
+                await self.test_update_kot_status(kot['_id'])
+            await self.test_table_status_update(tables_by_status)
         
         # Priority 2: Menu Management
-        print("\n📋 PRIORITY 2: MENU MANAGEMENT")
-        print("-" * 40)
-        created_menu_item = self.test_create_menu_item()
-        if created_menu_item:
-            self.test_update_menu_item(created_menu_item['_id'])
-            self.test_delete_menu_item(created_menu_item['_id'])
+        self.out("\n📋 PRIORITY 2: MENU MANAGEMENT")
+        self.out("-" * 40)
+        self.log_lines.extend(await menu_flow)
             
         # Priority 3: Other Endpoints
-        print("\n⚙️ PRIORITY 3: OTHER ENDPOINTS")
-        print("-" * 40)
-        self.test_get_orders()
-        self.test_employees_endpoints()
-        self.test_expenses_endpoints()
-        self.test_inventory_endpoints()
-        self.test_settings_endpoints()
-        self.test_auth_login()
+        self.out("\n⚙️ PRIORITY 3: OTHER ENDPOINTS")
+        self.out("-" * 40)
+        # No data dependencies between these, so they run concurrently
+        await asyncio.gather(
+            self.test_get_orders(),
+            self.test_employees_endpoints(),
+            self.test_expenses_endpoints(),
+            self.test_inventory_endpoints(),
+            self.test_settings_endpoints(),
+            self.test_auth_login()
+        )
         
         # Summary
-        print("\n" + "=" * 60)
-        print("TEST SUMMARY")
-        print("=" * 60)
+        self.out("\n" + "=" * 60)
+        self.out("TEST SUMMARY")
+        self.out("=" * 60)
         
-        passed = sum(1 for result in self.test_results if result['success'])
+        # One pass splits the results for the counts and both listings
+        passed, failed = [], []
+        for result in self.test_results:
+            (passed if result['success'] else failed).append(result)
         total = len(self.test_results)
         
-        print(f"Total Tests: {total}")
-        print(f"Passed: {passed}")
-        print(f"Failed: {total - passed}")
-        print(f"Success Rate: {(passed/total)*100:.1f}%")
+        self.out(f"Total Tests: {total}")
+        self.out(f"Passed: {len(passed)}")
+        self.out(f"Failed: {len(failed)}")
+        self.out(f"Success Rate: {(len(passed)/total)*100:.1f}%")
         
-        print("\nFailed Tests:")
-        for result in self.test_results:
-            if not result['success']:
-                print(f"  ❌ {result['test']}: {result['message']}")
+        self.out("\nFailed Tests:")
+        for result in failed:
+            self.out(f"  ❌ {result['test']}: {result['message']}")
                 
-        print("\nPassed Tests:")
-        for result in self.test_results:
-            if result['success']:
-                print(f"  ✅ {result['test']}: {result['message']}")
+        self.out("\nPassed Tests:")
+        for result in passed:
+            self.out(f"  ✅ {result['test']}: {result['message']}")
+            
+        if self.replayed:
+            self.out("\nReplayed from fixtures (not live): " + ", ".join(f"GET {path}" for path in self.replayed))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="RestoPOS backend API tests")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', dest='mode', action='store_const', const='record',
+                      help="save the replayable GET responses to the fixtures file")
+    mode.add_argument('--replay', dest='mode', action='store_const', const='replay',
+                      help="serve the replayable GETs from the fixtures file")
+    parser.add_argument('--fixtures', default=FIXTURES_PATH, help="fixtures file path")
+    return parser.parse_args()
+
+async def main(args):
+    fixtures = None
+    if args.mode == 'replay':
+        with open(args.fixtures, 'rb') as f:
+            fixtures = orjson.loads(f.read())
+    
+    # Every test talks to one host, so the whole pool is kept for it and idle
+    # sockets stay open between checks instead of being re-handshaked. The
+    # host is resolved once and pinned for the run (ttl_dns_cache=None), so
+    # new pool connections skip DNS.
+    connector = aiohttp.TCPConnector(
+        limit=32,
+        limit_per_host=32,
+        keepalive_timeout=30,
+        use_dns_cache=True,
+        ttl_dns_cache=None
+    )
+    # Ask for compressed bodies explicitly; aiohttp decompresses transparently
+    headers = {'Accept-Encoding': 'gzip, deflate'}
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        tester = RestoPOSAPITester(session, args.mode, fixtures)
+        try:
+            await tester.run_all_tests()
+        finally:
+            tester.flush()
+    
+    if args.mode == 'record':
+        with open(args.fixtures, 'wb') as f:
+            f.write(orjson.dumps(tester.fixtures, option=orjson.OPT_INDENT_2))
 
 if __name__ == "__main__":
-    tester = RestoPOSAPITester()
-    tester.run_all_tests()
\ No newline at end of file
+    asyncio.run(main(parse_args()))
\ No newline at end of file
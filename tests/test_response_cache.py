@@ -0,0 +1,65 @@
+import asyncio
+
+import orjson
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    server.response_cache.clear()
+    server.menu_lookup_cache.update({"map": {}, "expires": 0.0, "loaded": float('-inf')})
+    yield
+    server.response_cache.clear()
+
+
+def test_fill_started_before_an_invalidation_is_dropped():
+    generation = server.cache_generation('menu')
+    server.cache_invalidate('menu')
+    server.cache_set('menu', b'[]', generation=generation)
+    assert server.cache_get('menu') is None
+
+
+def test_get_menu_in_flight_during_a_write_does_not_cache_old_body(monkeypatch):
+    started, finish = asyncio.Event(), asyncio.Event()
+
+    async def slow_dump_cursor(cursor, limit):
+        started.set()
+        await finish.wait()
+        return b'[{"name":"old"}]'
+
+    monkeypatch.setattr(server, 'dump_cursor', slow_dump_cursor)
+
+    async def scenario():
+        read = asyncio.create_task(server.get_menu())
+        await started.wait()
+        server.invalidate_menu()
+        finish.set()
+        response = await read
+        return response.body
+
+    assert orjson.loads(asyncio.run(scenario())) == [{"name": "old"}]
+    assert server.cache_get('menu') is None
+
+
+def test_menu_lookup_in_flight_during_a_write_is_not_kept(monkeypatch):
+    started, finish = asyncio.Event(), asyncio.Event()
+
+    async def slow_fetch_docs(cursor, limit):
+        started.set()
+        await finish.wait()
+        return [{'_id': 'a', 'category': 'Old'}]
+
+    monkeypatch.setattr(server, 'fetch_docs', slow_fetch_docs)
+
+    async def scenario():
+        read = asyncio.create_task(server.menu_lookup())
+        await started.wait()
+        server.invalidate_menu()
+        finish.set()
+        return await read
+
+    assert asyncio.run(scenario()) == {'a': {'_id': 'a', 'category': 'Old'}}
+    assert server.menu_lookup_cache["map"] == {}
+    assert server.menu_lookup_cache["expires"] == 0.0
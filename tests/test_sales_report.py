@@ -0,0 +1,15 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.mark.parametrize('params', [
+    {'limit': 0},
+    {'limit': -1},
+    {'limit': 1001},
+    {'skip': -1},
+])
+def test_sales_report_rejects_out_of_range_paging(params):
+    response = TestClient(server.app).get('/api/reports/sales', params={'include_orders': True, **params})
+    assert response.status_code == 422
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+
+import orjson
+import pytest
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+
+import server
+
+
+class FakeCursor:
+    """Async iterator over a list with the cursor modifiers stream_json calls"""
+    def __init__(self, docs, error=None):
+        self.docs = iter(docs)
+        self.error = error
+        self.limit_value = None
+
+    def limit(self, n):
+        self.limit_value = n
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.error:
+            raise self.error
+        try:
+            return next(self.docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+async def collect(gen):
+    return b''.join([part async for part in gen])
+
+
+async def body_of(response):
+    if isinstance(response, StreamingResponse):
+        return await collect(response.body_iterator)
+    return response.body
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, server.STREAM_CHUNK, server.STREAM_CHUNK + 1, 250])
+def test_stream_cursor_emits_a_json_array(count):
+    docs = [{'_id': ObjectId(), 'n': i} for i in range(count)]
+    body = asyncio.run(collect(server.stream_cursor(FakeCursor(docs))))
+    assert orjson.loads(body) == [{'_id': str(d['_id']), 'n': d['n']} for d in docs]
+
+
+def test_stream_cursor_prepends_first_document():
+    body = asyncio.run(collect(server.stream_cursor(FakeCursor([{'n': 2}]), {'n': 1})))
+    assert orjson.loads(body) == [{'n': 1}, {'n': 2}]
+
+
+def test_stream_cursor_flushes_every_chunk():
+    docs = [{'n': i} for i in range(server.STREAM_CHUNK * 2 + 1)]
+
+    async def parts():
+        return [part async for part in server.stream_cursor(FakeCursor(docs))]
+
+    assert len(asyncio.run(parts())) == 3
+
+
+def test_stream_cursor_encodes_datetimes():
+    created = datetime(2024, 1, 2, 3, 4, 5)
+    body = asyncio.run(collect(server.stream_cursor(FakeCursor([{'createdAt': created}]))))
+    assert orjson.loads(body) == [{'createdAt': '2024-01-02T03:04:05+00:00'}]
+
+
+def test_stream_json_streams_documents():
+    cursor = FakeCursor([{'n': 1}, {'n': 2}])
+    response = asyncio.run(server.stream_json(cursor, 100))
+    assert cursor.limit_value == 100
+    assert orjson.loads(asyncio.run(body_of(response))) == [{'n': 1}, {'n': 2}]
+
+
+def test_stream_json_empty_result():
+    response = asyncio.run(server.stream_json(FakeCursor([]), 100))
+    assert asyncio.run(body_of(response)) == b'[]'
+
+
+def test_stream_json_raises_query_errors_before_responding():
+    with pytest.raises(RuntimeError):
+        asyncio.run(server.stream_json(FakeCursor([], error=RuntimeError('bad projection')), 100))
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_get_orders_rejects_non_positive_limits(limit):
+    from fastapi.testclient import TestClient
+    response = TestClient(server.app).get('/api/orders', params={'limit': limit})
+    assert response.status_code == 422
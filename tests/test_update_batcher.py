@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from server import UpdateBatcher
+
+
+class FakeCollection:
+    """Records bulk_write calls; optionally fails or blocks until released"""
+    def __init__(self, error=None, block=False):
+        self.calls = []
+        self.error = error
+        self.release = asyncio.Event() if block else None
+
+    async def bulk_write(self, ops):
+        self.calls.append([(op._filter['_id'], op._doc['$set']) for op in ops])
+        if self.release:
+            await self.release.wait()
+        if self.error:
+            raise self.error
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+def test_update_starts_the_worker_lazily():
+    async def scenario():
+        collection = FakeCollection()
+        batcher = UpdateBatcher(collection, max_wait=0.01)
+        doc_id = ObjectId()
+        await batcher.update(doc_id, {'status': 'ready'})
+        await batcher.stop()
+        return collection.calls, doc_id
+
+    calls, doc_id = run(scenario())
+    assert calls == [[(doc_id, {'status': 'ready'})]]
+
+
+def test_concurrent_updates_share_one_ordered_bulk_write():
+    async def scenario():
+        collection = FakeCollection()
+        batcher = UpdateBatcher(collection, max_wait=0.05)
+        doc_id = ObjectId()
+        await asyncio.gather(*(batcher.update(doc_id, {'n': i}) for i in range(5)))
+        await batcher.stop()
+        return collection.calls, doc_id
+
+    calls, doc_id = run(scenario())
+    assert calls == [[(doc_id, {'n': i}) for i in range(5)]]
+
+
+def test_full_batch_flushes_without_waiting():
+    async def scenario():
+        collection = FakeCollection()
+        batcher = UpdateBatcher(collection, max_batch=3, max_wait=60)
+        await asyncio.wait_for(
+            asyncio.gather(*(batcher.update(ObjectId(), {'n': i}) for i in range(3))),
+            1
+        )
+        await batcher.stop()
+        return collection.calls
+
+    calls = run(scenario())
+    assert [len(batch) for batch in calls] == [3]
+
+
+def test_batches_never_exceed_max_batch():
+    async def scenario():
+        collection = FakeCollection()
+        batcher = UpdateBatcher(collection, max_batch=4, max_wait=0.01)
+        await asyncio.gather(*(batcher.update(ObjectId(), {'n': i}) for i in range(10)))
+        await batcher.stop()
+        return collection.calls
+
+    calls = run(scenario())
+    assert all(len(batch) <= 4 for batch in calls)
+    assert [fields['n'] for batch in calls for _, fields in batch] == list(range(10))
+
+
+def test_bulk_write_errors_reach_every_caller():
+    async def scenario():
+        batcher = UpdateBatcher(FakeCollection(error=ValueError('boom')), max_wait=0.01)
+        results = await asyncio.gather(
+            *(batcher.update(ObjectId(), {'n': i}) for i in range(3)),
+            return_exceptions=True
+        )
+        await batcher.stop()
+        return results
+
+    results = run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_stop_fails_pending_updates():
+    async def scenario():
+        batcher = UpdateBatcher(FakeCollection(block=True), max_batch=2, max_wait=0.01)
+        in_flight = [asyncio.create_task(batcher.update(ObjectId(), {'n': i})) for i in range(2)]
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(batcher.update(ObjectId(), {'n': 2}))
+        await asyncio.sleep(0)
+        await batcher.stop()
+        return await asyncio.gather(*in_flight, queued, return_exceptions=True)
+
+    results = run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_update_times_out_instead_of_hanging():
+    async def scenario():
+        batcher = UpdateBatcher(FakeCollection(block=True), max_wait=0.01, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await batcher.update(ObjectId(), {'n': 1})
+        await batcher.stop()
+
+    run(scenario())
+
+
+def test_stop_fails_an_update_held_for_the_batch_window():
+    async def scenario():
+        collection = FakeCollection()
+        batcher = UpdateBatcher(collection, max_wait=60)
+        held = asyncio.create_task(batcher.update(ObjectId(), {'n': 1}))
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.gather(held, return_exceptions=True), collection.calls
+
+    (result,), calls = run(scenario())
+    assert isinstance(result, RuntimeError)
+    assert calls == []
+
+
+def test_timed_out_update_is_not_applied():
+    async def scenario():
+        collection = FakeCollection()
+        batcher = UpdateBatcher(collection, max_wait=0.2, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await batcher.update(ObjectId(), {'n': 1})
+        # Let the batch window close and the worker flush
+        await asyncio.sleep(0.3)
+        await batcher.stop()
+        return collection.calls
+
+    assert run(scenario()) == []